@@ -0,0 +1,144 @@
+"""
+Throughput benchmark for the process-pool stages on bulk workloads:
+re-indexing the session store from disk, matching many requests against
+the character index, and batch-validating storyteller output.
+
+    python bench_cpu_pool.py --sessions 200000 --inputs 50 --outputs 200000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from session import build_character_index, find_candidate_session_ids
+from cpu_pool import (
+    PARSERS,
+    build_character_index_from_file,
+    find_candidate_session_ids_batch,
+    validate_outputs,
+)
+
+
+def make_sessions(n: int) -> dict:
+    return {
+        f"session-{i}": {
+            "characters": {
+                f"Character{i % 5000}": "a friendly helper",
+                f"Pal{i % 977}": "a curious explorer",
+                f"Buddy{i}": "a kind companion",
+            },
+            "summary": "A gentle story about friends.",
+        }
+        for i in range(n)
+    }
+
+
+def make_user_inputs(n: int) -> list[str]:
+    return [f"tell me more about Character{i * 7 % 5000} and the big tree" for i in range(n)]
+
+
+def write_sessions_file(sessions: dict, path: str) -> None:
+    # same layout as session.save_sessions
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"sessions": sessions}, f, indent=2)
+
+
+def index_from_file_serial(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return build_character_index(json.load(f)["sessions"])
+
+
+def make_storyteller_outputs(n: int) -> list[str]:
+    outputs = []
+    for i in range(n):
+        outputs.append(json.dumps({
+            "story_text": "Once upon a time, a small dog found a map. " * 20,
+            "metadata": {
+                "characters": {f"Dog{i}": "a brave puppy", "Owl": "a wise bird"},
+                "setting": "A quiet forest at dusk.",
+                "summary": "A puppy and an owl set off to follow a map.",
+                "current_stage": "setup",
+            },
+        }))
+    return outputs
+
+
+def time_it(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def worker_counts(max_workers: int) -> list[int]:
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def report(name: str, items: int, serial: float, timings: dict[int, float]) -> None:
+    print(f"\n{name} ({items} items)")
+    print(f"  serial     {serial:8.3f}s  {items / serial:12.1f} items/s")
+    for workers, elapsed in timings.items():
+        speedup = serial / elapsed
+        print(
+            f"  {workers:2d} workers {elapsed:8.3f}s  {items / elapsed:12.1f} items/s"
+            f"  speedup {speedup:5.2f}x  efficiency {speedup / workers:5.0%}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200_000)
+    parser.add_argument("--inputs", type=int, default=50)
+    parser.add_argument("--outputs", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=2048)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench_sessions_")
+    sessions_path = os.path.join(scratch, "sessions.json")
+    write_sessions_file(make_sessions(args.sessions), sessions_path)
+    index = index_from_file_serial(sessions_path)
+    user_inputs = make_user_inputs(args.inputs)
+    outputs = make_storyteller_outputs(args.outputs)
+    parse = PARSERS["storyteller"]
+
+    index_serial = time_it(lambda: index_from_file_serial(sessions_path))
+    match_serial = time_it(lambda: [find_candidate_session_ids(u, index) for u in user_inputs])
+    validate_serial = time_it(lambda: [parse(o) for o in outputs])
+
+    index_timings = {}
+    match_timings = {}
+    validate_timings = {}
+    for workers in worker_counts(args.max_workers):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # warm up so process start-up isn't counted
+            list(pool.map(abs, range(workers)))
+            index_timings[workers] = time_it(
+                lambda: build_character_index_from_file(sessions_path, pool, workers * 4)
+            )
+            match_timings[workers] = time_it(
+                lambda: find_candidate_session_ids_batch(user_inputs, index, pool, workers)
+            )
+            validate_timings[workers] = time_it(
+                lambda: validate_outputs(
+                    "storyteller", outputs, pool, args.batch_size, keep_results=False
+                )
+            )
+
+    os.remove(sessions_path)
+    os.rmdir(scratch)
+
+    report("re-index sessions.json (parse + index)", args.sessions, index_serial, index_timings)
+    report("match requests against character index", args.inputs, match_serial, match_timings)
+    report("validate storyteller outputs", args.outputs, validate_serial, validate_timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Keeps the story cache warm and varied. Entries are generated through the
+checkpointed job pipeline, with persistence to sessions turned off.
+
+    python cache_refresher.py
+"""
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+from arc_selector import load_arcs
+from context_builder import build_story_context
+from session import new_story_session
+from job_queue import connect_queue, get_job
+from worker import make_worker_id, submit_story_job, run_job
+from story_cache import extract_features, cache_key, load_cache, stale_entries, cache_report
+
+REFRESH_INTERVAL_SECONDS = 600
+
+# Prompts worth having ready before the first user asks for them.
+POPULAR_PROMPTS = [
+    "a story about a brave dog",
+    "a bedtime story about friends",
+    "a story about a curious cat exploring the forest",
+    "a story about a kind bear who helps others",
+    "an adventure about a dragon and a treasure map",
+    "a story about a child solving a puzzle",
+]
+
+
+def generate_cache_entry(prompt: str, arc: Dict) -> bool:
+    """
+    Run a new-story job for the prompt; on approval the worker adds the
+    story to the cache. Returns True if the job finished.
+    """
+    conn = connect_queue()
+    worker_id = make_worker_id()
+    session = new_story_session()
+    context = build_story_context(session, arc, prompt, False)
+    job_id = submit_story_job(
+        conn, session, arc, context,
+        lease_owner=worker_id, persist=False, cache=True,
+    )
+    job = run_job(conn, get_job(conn, job_id), worker_id)
+    return job["status"] == "done"
+
+
+def warm_cache(prompts: list[str] = POPULAR_PROMPTS) -> int:
+    """
+    Precompute entries for popular prompts that are not cached yet.
+    Returns the number of entries added.
+    """
+    arcs = load_arcs()
+    existing = load_cache()["entries"]
+    added = 0
+
+    for prompt in prompts:
+        features = extract_features(prompt, arcs)
+        if cache_key(features) in existing:
+            continue
+        if generate_cache_entry(prompt, arcs["arcs"][features["arc_id"]]):
+            added += 1
+
+    return added
+
+
+def refresh_stale_entries(limit: Optional[int] = None) -> int:
+    """
+    Regenerate entries that are old or have been served many times,
+    so popular prompts don't always get the same story.
+    Returns the number of entries refreshed.
+    """
+    arcs = load_arcs()
+    refreshed = 0
+    for _, entry, _ in stale_entries()[:limit]:
+        if generate_cache_entry(entry["prompt"], arcs["arcs"][entry["arc_id"]]):
+            refreshed += 1
+    return refreshed
+
+
+def start_background_refresher(interval: float = REFRESH_INTERVAL_SECONDS) -> threading.Thread:
+    def loop():
+        while True:
+            try:
+                refresh_stale_entries()
+            except Exception as e:
+                print(f"Cache refresh failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    print(f"Warmed {warm_cache()} popular prompts")
+    print(json.dumps(cache_report(), indent=2))
+    start_background_refresher()
+    while True:
+        time.sleep(60)
+        print(json.dumps(cache_report(), indent=2))
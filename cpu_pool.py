@@ -0,0 +1,265 @@
+"""
+Process pool for bulk CPU-bound work over the session store and model
+outputs: re-indexing characters, matching many requests and batch
+validation. Per-request work stays inline, where a pool round trip
+costs more than it saves.
+
+    python cpu_pool.py reindex
+    python cpu_pool.py validate storyteller outputs.jsonl
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+import session
+from session import build_character_index, find_candidate_session_ids
+from story_teller import parse_storyteller_output, parse_storyteller_delta_output
+from judge import parse_judge_output
+from summarizer import parse_summary_output
+
+
+DEFAULT_BATCH_SIZE = 256
+
+# Parsers are looked up by name inside the child process so only
+# plain strings cross the process boundary.
+PARSERS: Dict[str, Callable[[str], object]] = {
+    "storyteller": parse_storyteller_output,
+    "storyteller_delta": parse_storyteller_delta_output,
+    "judge": parse_judge_output,
+    "summary": parse_summary_output,
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Shared process pool for CPU-bound stages.
+    Created lazily; defaults to one worker per core.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def chunked(items: List, batch_size: int) -> Iterable[List]:
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def _validate_batch(parser_name: str, outputs: List[str], keep_results: bool) -> List[Dict]:
+    parser = PARSERS[parser_name]
+    results = []
+    for output in outputs:
+        try:
+            result = parser(output)
+            results.append({"ok": True, "result": result if keep_results else None, "error": None})
+        except ValueError as e:
+            results.append({"ok": False, "result": None, "error": str(e)})
+    return results
+
+
+def validate_outputs(
+    parser_name: str,
+    outputs: List[str],
+    pool: Optional[ProcessPoolExecutor] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    keep_results: bool = True,
+) -> List[Dict]:
+    """
+    Validate many raw model outputs with one of the parse_*_output
+    functions, fanning batches out across the pool.
+    Returns one {"ok", "result", "error"} dict per output, in order.
+    With keep_results=False parsed objects are not sent back, which
+    keeps pickling cost down when only validity matters.
+    """
+    if parser_name not in PARSERS:
+        raise ValueError(f"Unknown parser: {parser_name}")
+
+    pool = pool or get_pool()
+    batches = list(chunked(outputs, batch_size))
+    results: List[Dict] = []
+    for batch_results in pool.map(
+        _validate_batch,
+        [parser_name] * len(batches),
+        batches,
+        [keep_results] * len(batches),
+    ):
+        results.extend(batch_results)
+    return results
+
+
+def merge_character_indexes(indexes: Iterable[dict[str, set[str]]]) -> dict[str, set[str]]:
+    merged: dict[str, set[str]] = {}
+    for index in indexes:
+        for char, session_ids in index.items():
+            existing = merged.get(char)
+            if existing is None:
+                # shards are fresh objects, so their sets can be reused
+                merged[char] = session_ids
+            else:
+                existing |= session_ids
+    return merged
+
+
+# save_sessions writes json.dump(..., indent=2), so every session id in
+# the store starts a line with exactly four spaces of indentation.
+_STORE_HEADER = b'{\n  "sessions": {\n'
+_SESSION_KEY_LINE = b'\n    "'
+_STORE_FOOTER = b"\n  }"
+
+
+def _session_shard_ranges(path: str, shards: int) -> Optional[List[tuple[int, int]]]:
+    """
+    Split the session store into byte ranges that each hold whole
+    sessions. Only a few bytes around each split point are read, so
+    the parent never parses or scans the whole file. Returns None if
+    the file is not in the layout save_sessions writes.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if f.read(len(_STORE_HEADER)) != _STORE_HEADER:
+            return None
+        f.seek(max(0, size - 64))
+        tail = f.read()
+        footer = tail.rfind(_STORE_FOOTER)
+        if footer < 0:
+            return None
+        body_start = len(_STORE_HEADER) - 1
+        body_end = size - len(tail) + footer
+        if body_end <= body_start:
+            return None
+
+        bounds = [body_start]
+        step = (body_end - body_start) // shards
+        for k in range(1, shards):
+            pos = max(bounds[-1] + 1, body_start + k * step)
+            f.seek(pos)
+            # sessions are small, so the next key line is close by
+            window = f.read(1 << 16)
+            found = window.find(_SESSION_KEY_LINE)
+            if found < 0 or pos + found >= body_end:
+                break
+            bounds.append(pos + found)
+
+    bounds.append(body_end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _index_shard(path: str, start: int, end: int) -> dict[str, set[str]]:
+    """
+    Read and parse one byte range of the session store and index it.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        chunk = f.read(end - start)
+
+    sessions = json.loads(b"{" + chunk.strip().rstrip(b",") + b"}")
+    return build_character_index(sessions)
+
+
+def build_character_index_from_file(
+    path: Optional[str] = None,
+    pool: Optional[ProcessPoolExecutor] = None,
+    shards: Optional[int] = None,
+) -> dict[str, set[str]]:
+    """
+    Same result as build_character_index(load_sessions()["sessions"]),
+    but each worker reads and parses its own slice of the store, so
+    the JSON parsing is parallelized along with the indexing.
+    """
+    path = path or session.SESSIONS_FILE
+    if not os.path.exists(path):
+        return {}
+
+    ranges = _session_shard_ranges(path, shards or os.cpu_count() * 4)
+    if ranges is None:
+        with open(path, "r", encoding="utf-8") as f:
+            return build_character_index(json.load(f)["sessions"])
+
+    pool = pool or get_pool()
+
+    results = pool.map(
+        _index_shard,
+        [path] * len(ranges),
+        [start for start, _ in ranges],
+        [end for _, end in ranges],
+    )
+    return merge_character_indexes(results)
+
+
+def _match_inputs(user_inputs: List[str], character_index: dict[str, set[str]]) -> List[List[str]]:
+    return [
+        list(find_candidate_session_ids(user_input, character_index))
+        for user_input in user_inputs
+    ]
+
+
+def find_candidate_session_ids_batch(
+    user_inputs: List[str],
+    character_index: dict[str, set[str]],
+    pool: Optional[ProcessPoolExecutor] = None,
+    shards: Optional[int] = None,
+) -> List[set[str]]:
+    """
+    find_candidate_session_ids for many inputs at once. The index is
+    split by character across workers, so each character's regex work
+    happens once per input and the index is only sent over once.
+    """
+    pool = pool or get_pool()
+    shards = shards or os.cpu_count()
+    items = list(character_index.items())
+    per_shard = max(1, -(-len(items) // shards))
+    sub_indexes = [dict(batch) for batch in chunked(items, per_shard)]
+
+    candidates: List[set[str]] = [set() for _ in user_inputs]
+    for shard_result in pool.map(_match_inputs, [user_inputs] * len(sub_indexes), sub_indexes):
+        for found, ids in zip(candidates, shard_result):
+            found.update(ids)
+    return candidates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk CPU-bound jobs on a process pool")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reindex = commands.add_parser("reindex", help="rebuild the character index from the session store")
+    reindex.add_argument("--path", default=None, help="sessions file (defaults to the app's store)")
+
+    validate = commands.add_parser("validate", help="validate raw model outputs, one JSON string per line")
+    validate.add_argument("parser", choices=sorted(PARSERS))
+    validate.add_argument("outputs_file")
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    try:
+        if args.command == "reindex":
+            index = build_character_index_from_file(args.path)
+            session_ids = set().union(*index.values()) if index else set()
+            print(f"Indexed {len(index)} characters across {len(session_ids)} sessions")
+        else:
+            with open(args.outputs_file, "r", encoding="utf-8") as f:
+                outputs = [json.loads(line) for line in f if line.strip()]
+            results = validate_outputs(args.parser, outputs, keep_results=False)
+            errors = [(i, r["error"]) for i, r in enumerate(results) if not r["ok"]]
+            print(f"{len(results) - len(errors)} valid, {len(errors)} invalid")
+            for i, error in errors[:10]:
+                print(f"  line {i + 1}: {error}")
+    finally:
+        shutdown_pool()
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
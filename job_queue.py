@@ -0,0 +1,308 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+DATA_DIR = "data"
+QUEUE_FILE = os.path.join(DATA_DIR, "jobs.db")
+
+# Pipeline stages in order. A job's `stage` is the next stage to run,
+# so a job that crashed mid-stage resumes from that stage.
+STAGES = ["generate", "evaluate", "summarize", "persist", "done"]
+
+LEASE_SECONDS = 120
+
+# Failed stage attempts before a job is given up on, and the base delay
+# before a failed job becomes claimable again (doubles per attempt).
+MAX_JOB_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 5
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker tries to checkpoint a job it no longer holds."""
+
+
+def connect_queue(path: str = QUEUE_FILE) -> sqlite3.Connection:
+    """
+    Open the job queue, creating the schema if needed.
+    Autocommit mode so claims can take an explicit write lock.
+    """
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            lease_owner TEXT,
+            lease_expires_at REAL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT
+        )
+        """
+    )
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+    if "attempts" not in columns:
+        conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+    return conn
+
+
+def _queue_path(conn: sqlite3.Connection) -> str:
+    return conn.execute("PRAGMA database_list").fetchone()["file"]
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+def enqueue_job(
+    conn: sqlite3.Connection,
+    payload: Dict,
+    lease_owner: Optional[str] = None,
+    lease_seconds: float = LEASE_SECONDS,
+) -> str:
+    """
+    Add a new story job starting at the first stage.
+    With `lease_owner` the job is inserted already claimed by that
+    worker, so no other worker can take it before the caller runs it.
+    Returns the job_id.
+    """
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    status = "pending" if lease_owner is None else "running"
+    lease_expires_at = None if lease_owner is None else now + lease_seconds
+    conn.execute(
+        "INSERT INTO jobs (job_id, status, stage, payload, lease_owner, lease_expires_at, "
+        "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, status, STAGES[0], json.dumps(payload), lease_owner, lease_expires_at, now, now),
+    )
+    return job_id
+
+
+def claim_job(
+    conn: sqlite3.Connection,
+    worker_id: str,
+    job_id: Optional[str] = None,
+    lease_seconds: float = LEASE_SECONDS,
+    max_attempts: int = MAX_JOB_ATTEMPTS,
+) -> Optional[Dict]:
+    """
+    Claim the oldest unleased job (or a specific job) for this worker.
+    Jobs whose lease expired are reclaimable, which is how work from a
+    crashed worker gets resumed. Taking over an expired lease counts
+    as a failed attempt, so a stage that keeps killing its worker ends
+    in fail_job instead of being retried forever.
+    Returns the job or None if nothing is claimable.
+    """
+    now = time.time()
+    query = (
+        "SELECT * FROM jobs WHERE status IN ('pending', 'running') "
+        "AND (lease_expires_at IS NULL OR lease_expires_at < ?)"
+    )
+    params: list = [now]
+    if job_id is not None:
+        query += " AND job_id = ?"
+        params.append(job_id)
+    query += " ORDER BY created_at LIMIT 1"
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        while True:
+            row = conn.execute(query, params).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            attempts = row["attempts"]
+            # retry_job clears the owner, so an owner here means the
+            # previous worker died holding the lease
+            if row["lease_owner"] is not None:
+                attempts += 1
+                if attempts >= max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', attempts = ?, error = ?, "
+                        "lease_owner = NULL, updated_at = ? WHERE job_id = ?",
+                        (attempts, f"lease expired {attempts} times", now, row["job_id"]),
+                    )
+                    continue
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', lease_owner = ?, attempts = ?, "
+                "lease_expires_at = ?, updated_at = ? WHERE job_id = ?",
+                (worker_id, attempts, now + lease_seconds, now, row["job_id"]),
+            )
+            conn.execute("COMMIT")
+            break
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    job = _row_to_job(row)
+    job["status"] = "running"
+    job["lease_owner"] = worker_id
+    job["attempts"] = attempts
+    return job
+
+
+def checkpoint_job(
+    conn: sqlite3.Connection,
+    job: Dict,
+    worker_id: str,
+    next_stage: str,
+    lease_seconds: float = LEASE_SECONDS,
+) -> None:
+    """
+    Durably record the job payload and advance it to `next_stage`.
+    Also renews the lease. Raises LeaseLostError if another worker
+    has taken the job over.
+    """
+    if next_stage not in STAGES:
+        raise ValueError(f"Unknown stage: {next_stage}")
+
+    now = time.time()
+    status = "done" if next_stage == "done" else "running"
+    cur = conn.execute(
+        "UPDATE jobs SET stage = ?, status = ?, payload = ?, "
+        "lease_expires_at = ?, updated_at = ? "
+        "WHERE job_id = ? AND lease_owner = ?",
+        (
+            next_stage,
+            status,
+            json.dumps(job["payload"]),
+            now + lease_seconds,
+            now,
+            job["job_id"],
+            worker_id,
+        ),
+    )
+    if cur.rowcount == 0:
+        raise LeaseLostError(f"Lease lost on job {job['job_id']}")
+
+    job["stage"] = next_stage
+    job["status"] = status
+
+
+def fail_job(conn: sqlite3.Connection, job: Dict, worker_id: str, error: str) -> None:
+    """
+    Mark a job as permanently failed so it is not reclaimed.
+    """
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', error = ?, payload = ?, updated_at = ? "
+        "WHERE job_id = ? AND lease_owner = ?",
+        (error, json.dumps(job["payload"]), time.time(), job["job_id"], worker_id),
+    )
+    job["status"] = "failed"
+    job["error"] = error
+
+
+def renew_lease(
+    conn: sqlite3.Connection,
+    job_id: str,
+    worker_id: str,
+    lease_seconds: float = LEASE_SECONDS,
+) -> bool:
+    """
+    Extend the lease on a job. Returns False if the worker lost it.
+    """
+    cur = conn.execute(
+        "UPDATE jobs SET lease_expires_at = ? WHERE job_id = ? AND lease_owner = ?",
+        (time.time() + lease_seconds, job_id, worker_id),
+    )
+    return cur.rowcount > 0
+
+
+def retry_job(
+    conn: sqlite3.Connection,
+    job: Dict,
+    worker_id: str,
+    error: str,
+    max_attempts: int = MAX_JOB_ATTEMPTS,
+    backoff_seconds: float = RETRY_BACKOFF_SECONDS,
+) -> None:
+    """
+    Record a failed stage attempt, keeping completed checkpoints.
+    The job becomes claimable again after an exponential backoff, or
+    is failed for good once it has used up `max_attempts`.
+    """
+    attempts = job.get("attempts", 0) + 1
+    job["attempts"] = attempts
+    if attempts >= max_attempts:
+        fail_job(conn, job, worker_id, f"gave up after {attempts} attempts: {error}")
+        return
+
+    # an expired lease with no owner is what claim_job looks for, so a
+    # lease expiring in the future doubles as the retry delay
+    retry_at = time.time() + backoff_seconds * 2 ** (attempts - 1)
+    conn.execute(
+        "UPDATE jobs SET attempts = ?, error = ?, payload = ?, lease_owner = NULL, "
+        "lease_expires_at = ?, updated_at = ? WHERE job_id = ? AND lease_owner = ?",
+        (attempts, error, json.dumps(job["payload"]), retry_at, time.time(),
+         job["job_id"], worker_id),
+    )
+    job["error"] = error
+
+
+class LeaseHeartbeat:
+    """
+    Keeps a job's lease alive from a background thread while a slow
+    stage (a model call) runs, so no other worker takes the job over
+    and pays for the same stage again.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        job_id: str,
+        worker_id: str,
+        lease_seconds: float = LEASE_SECONDS,
+    ):
+        self.path = _queue_path(conn)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        # sqlite connections can't be shared across threads
+        conn = connect_queue(self.path)
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                if not renew_lease(conn, self.job_id, self.worker_id, self.lease_seconds):
+                    self.lost = True
+                    return
+        finally:
+            conn.close()
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def get_job(conn: sqlite3.Connection, job_id: str) -> Optional[Dict]:
+    row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    return _row_to_job(row)
+
+
+def list_unfinished_jobs(conn: sqlite3.Connection) -> list[Dict]:
+    rows = conn.execute(
+        "SELECT * FROM jobs WHERE status IN ('pending', 'running') ORDER BY created_at"
+    ).fetchall()
+    return [_row_to_job(row) for row in rows]
@@ -0,0 +1,433 @@
+"""
+Load-test harness for the story pipeline.
+
+Simulates concurrent users mixing new stories, continuations and clears
+against a scratch copy of the data files, with the model replaced by a
+fake that sleeps for a configurable latency. Reports throughput, latency
+percentiles, error rates and integrity checks on the session store.
+
+    python loadgen.py --users 16 --duration 30 --latency 0.2
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import session
+import job_queue
+import story_cache
+import story_teller
+import judge
+import summarizer
+from arc_selector import load_arcs, select_predefined_arc
+from context_builder import build_story_context
+from session import (
+    new_story_session,
+    session_from_record,
+    persist_session,
+    load_sessions,
+    clear_sessions,
+    build_character_index,
+    find_candidate_session_ids,
+)
+from worker import make_worker_id, submit_story_job, run_job
+
+
+ACTIONS = ["new", "continue", "clear"]
+
+NEW_PROMPTS = [
+    "a story about a brave dog",
+    "a bedtime story about friends",
+    "a story about a curious cat exploring the ocean",
+    "an adventure about a dragon and a treasure map",
+    "a story about a child solving a puzzle",
+]
+
+
+class FakeModel:
+    """
+    Stands in for call_model. Answers each prompt type with valid JSON
+    after sleeping for `latency` seconds (+/- `jitter`).
+    """
+
+    def __init__(self, latency: float, jitter: float, reject_rate: float, error_rate: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.reject_rate = reject_rate
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def _next_name(self) -> str:
+        with self._lock:
+            self._counter += 1
+            return f"Pip{self._counter}"
+
+    def __call__(self, prompt: str, max_tokens=3000, temperature=0.3) -> str:
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        if random.random() < self.error_rate:
+            raise RuntimeError("fake model error")
+
+        if "story quality judge" in prompt:
+            kind = "judge"
+            passed = random.random() >= self.reject_rate
+            output = {
+                "scores": {"age_appropriateness": 5, "arc_alignment": 5 if passed else 2, "creativity": 4},
+                "overall_pass": passed,
+                "feedback": "" if passed else "Follow the arc more closely.",
+                "failure_reason": None if passed else "arc_misalignment",
+            }
+        elif "summarization assistant" in prompt:
+            kind = "summarizer"
+            output = {"summary": "A gentle story with friends."}
+        else:
+            # the first stage listed in the output format is always allowed
+            stage = re.search(r'"current_stage": "one of: ([^,"]+)', prompt).group(1)
+            name = self._next_name()
+            if "continuing an existing story" in prompt:
+                kind = "storyteller_continue"
+                output = {
+                    "story_text": f"{name} joined the adventure.",
+                    "delta": {
+                        "characters": {name: "a new friend"},
+                        "setting": None,
+                        "summary": f"{name} joined in.",
+                        "current_stage": stage,
+                    },
+                }
+            else:
+                kind = "storyteller_new"
+                output = {
+                    "story_text": f"Once upon a time {name} set off.",
+                    "metadata": {
+                        "characters": {name: "a cheerful hero"},
+                        "setting": "A sunny meadow.",
+                        "summary": f"{name} set off on a trip.",
+                        "current_stage": stage,
+                    },
+                }
+
+        with self._lock:
+            self.calls[kind] += 1
+        return json.dumps(output)
+
+
+class Ledger:
+    """
+    Records what each completed job wrote and when clears happened, so
+    the final session store can be checked for lost updates.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clears: List[float] = []
+        self.writes: Dict[str, List[Dict]] = defaultdict(list)
+
+    def record_clear(self, started_at: float) -> None:
+        with self._lock:
+            self.clears.append(started_at)
+
+    def record_write(self, session_id: str, started_at: float, finished_at: float, characters: Dict) -> None:
+        with self._lock:
+            self.writes[session_id].append({
+                "started_at": started_at,
+                "finished_at": finished_at,
+                "characters": set(characters),
+            })
+
+
+def patch_environment(model: FakeModel, data_dir: str) -> None:
+    """
+    Point every module at the scratch data dir and the fake model.
+    """
+    session.SESSIONS_FILE = os.path.join(data_dir, "sessions.json")
+    job_queue.QUEUE_FILE = os.path.join(data_dir, "jobs.db")
+    story_cache.CACHE_FILE = os.path.join(data_dir, "story_cache.json")
+    story_cache.STATS_FILE = os.path.join(data_dir, "story_cache_stats.json")
+
+    story_teller.call_model = model
+    judge.call_model = model
+    summarizer.call_model = model
+
+
+def warm_cache(arcs: Dict) -> None:
+    """
+    Fill the scratch cache the way cache_refresher does, with jobs that
+    write to the cache and not to the session store. User jobs never
+    write to the cache.
+    """
+    conn = job_queue.connect_queue(job_queue.QUEUE_FILE)
+    worker_id = make_worker_id()
+    for prompt in NEW_PROMPTS:
+        arc = select_predefined_arc(prompt, arcs)
+        story_session = new_story_session()
+        context = build_story_context(story_session, arc, prompt, False)
+        job_id = submit_story_job(
+            conn, story_session, arc, context,
+            lease_owner=worker_id, persist=False, cache=True,
+        )
+        try:
+            run_job(conn, job_queue.get_job(conn, job_id), worker_id)
+        except Exception:
+            # a prompt that failed to warm is simply a miss during the run
+            pass
+    conn.close()
+
+
+def simulated_user(
+    user_id: int,
+    deadline: float,
+    weights: List[float],
+    results: List[Dict],
+    ledger: Ledger,
+    arcs: Dict,
+    use_cache: bool,
+) -> None:
+    conn = job_queue.connect_queue(job_queue.QUEUE_FILE)
+    worker_id = make_worker_id()
+
+    while time.time() < deadline:
+        action = random.choices(ACTIONS, weights=weights)[0]
+        started_at = time.time()
+        start = time.perf_counter()
+        outcome = "ok"
+        error = None
+
+        try:
+            if action == "clear":
+                ledger.record_clear(started_at)
+                clear_sessions()
+
+            else:
+                sessions = load_sessions()["sessions"]
+                target = None
+                if action == "continue":
+                    index = build_character_index(sessions)
+                    if index:
+                        name = random.choice(list(index))
+                        candidates = find_candidate_session_ids(f"more about {name} please", index)
+                        if candidates:
+                            target = random.choice(sorted(candidates))
+                    if target is None:
+                        # nothing to continue yet
+                        action = "new"
+
+                if target is not None:
+                    story_session = session_from_record(target, sessions[target])
+                    arc = arcs["arcs"][story_session.arc_id]
+                    user_input = "what happens next?"
+                    is_continuation = True
+                else:
+                    story_session = new_story_session()
+                    user_input = random.choice(NEW_PROMPTS)
+                    arc = select_predefined_arc(user_input, arcs)
+                    is_continuation = False
+
+                cached = None
+                if use_cache and not is_continuation:
+                    cached = story_cache.find_cached_story(user_input, arcs)
+
+                if cached is not None:
+                    # a served story is saved as the user's session, as in user_actions
+                    persist_session(story_session, cached["story"], cached["summary"], arc)
+                    outcome = "cache_hit"
+                    ledger.record_write(
+                        story_session.session_id,
+                        started_at,
+                        time.time(),
+                        cached["story"]["metadata"]["characters"],
+                    )
+                else:
+                    context = build_story_context(story_session, arc, user_input, is_continuation)
+                    job_id = submit_story_job(conn, story_session, arc, context, lease_owner=worker_id)
+                    job = run_job(conn, job_queue.get_job(conn, job_id), worker_id)
+                    outcome = job["status"]
+                    if job["status"] == "done":
+                        ledger.record_write(
+                            story_session.session_id,
+                            started_at,
+                            time.time(),
+                            job["payload"]["story"]["metadata"]["characters"],
+                        )
+
+        except json.JSONDecodeError as e:
+            outcome = "error"
+            error = f"corrupted_json: {e.msg}"
+        except Exception as e:
+            outcome = "error"
+            error = f"{type(e).__name__}: {e}"
+
+        results.append({
+            "user": user_id,
+            "action": action,
+            "outcome": outcome,
+            "error": error,
+            "latency": time.perf_counter() - start,
+        })
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def check_integrity(ledger: Ledger) -> Dict:
+    """
+    Verify the final session store parses and still holds the last
+    write for every session that no clear could have wiped.
+    """
+    try:
+        with open(session.SESSIONS_FILE, "r", encoding="utf-8") as f:
+            sessions = json.load(f)["sessions"]
+    except (json.JSONDecodeError, KeyError) as e:
+        return {"store_valid_json": False, "error": str(e), "lost_updates": None}
+
+    checked = 0
+    lost: List[str] = []
+    for session_id, writes in ledger.writes.items():
+        last = max(writes, key=lambda w: w["finished_at"])
+        if any(c >= last["started_at"] for c in ledger.clears):
+            continue
+        checked += 1
+        stored = sessions.get(session_id)
+        if stored is None or not last["characters"] <= set(stored.get("characters", {})):
+            lost.append(session_id)
+
+    return {
+        "store_valid_json": True,
+        "sessions_in_store": len(sessions),
+        "sessions_checked": checked,
+        "lost_updates": len(lost),
+        "lost_session_ids": lost[:10],
+    }
+
+
+def summarize_results(results: List[Dict], elapsed: float) -> Dict:
+    by_action: Dict[str, Dict] = {}
+    for action in ACTIONS:
+        rows = [r for r in results if r["action"] == action]
+        if not rows:
+            continue
+        latencies = [r["latency"] for r in rows]
+        errors = [r for r in rows if r["outcome"] == "error"]
+        by_action[action] = {
+            "count": len(rows),
+            "outcomes": dict(Counter(r["outcome"] for r in rows)),
+            "error_rate": len(errors) / len(rows),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+        }
+
+    errors = Counter(r["error"] for r in results if r["error"])
+    return {
+        "operations": len(results),
+        "elapsed_seconds": elapsed,
+        "throughput_ops_per_second": len(results) / elapsed if elapsed else 0.0,
+        "error_rate": sum(errors.values()) / len(results) if results else 0.0,
+        "errors": dict(errors.most_common(10)),
+        "by_action": by_action,
+    }
+
+
+def run_load_test(
+    users: int,
+    duration: float,
+    latency: float,
+    jitter: float = 0.0,
+    reject_rate: float = 0.0,
+    error_rate: float = 0.0,
+    weights: Optional[List[float]] = None,
+    use_cache: bool = False,
+    data_dir: Optional[str] = None,
+) -> Dict:
+    weights = weights or [0.6, 0.35, 0.05]
+    scratch = data_dir or tempfile.mkdtemp(prefix="story_load_")
+    model = FakeModel(latency, jitter, reject_rate, error_rate)
+    patch_environment(model, scratch)
+    arcs = load_arcs()
+    clear_sessions()
+    if use_cache:
+        warm_cache(arcs)
+        # only count model calls made during the measured run
+        model.calls.clear()
+
+    ledger = Ledger()
+    results: List[Dict] = []
+    deadline = time.time() + duration
+    threads = [
+        threading.Thread(
+            target=simulated_user,
+            args=(i, deadline, weights, results, ledger, arcs, use_cache),
+        )
+        for i in range(users)
+    ]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    report = summarize_results(results, elapsed)
+    report["users"] = users
+    report["model_latency_seconds"] = latency
+    report["model_calls"] = dict(model.calls)
+    report["integrity"] = check_integrity(ledger)
+
+    if data_dir is None:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent load test for the story pipeline")
+    parser.add_argument("--users", type=int, nargs="+", default=[8],
+                        help="one or more concurrency levels; several values sweep for saturation")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--reject-rate", type=float, default=0.1, help="fraction of stories the judge rejects")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of model calls that raise")
+    parser.add_argument("--mix", type=float, nargs=3, default=[0.6, 0.35, 0.05],
+                        metavar=("NEW", "CONTINUE", "CLEAR"))
+    parser.add_argument("--use-cache", action="store_true")
+    parser.add_argument("--keep-data", metavar="DIR", help="write data files here and keep them")
+    args = parser.parse_args()
+
+    for users in args.users:
+        data_dir = None
+        if args.keep_data:
+            data_dir = os.path.join(args.keep_data, f"users_{users}")
+            os.makedirs(data_dir, exist_ok=True)
+
+        report = run_load_test(
+            users=users,
+            duration=args.duration,
+            latency=args.latency,
+            jitter=args.jitter,
+            reject_rate=args.reject_rate,
+            error_rate=args.error_rate,
+            weights=args.mix,
+            use_cache=args.use_cache,
+            data_dir=data_dir,
+        )
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -103,6 +103,35 @@ def find_candidate_session_ids(
 
 
 
+def new_story_session() -> StorySession:
+    return StorySession(
+        session_id=str(uuid.uuid4()),
+        created_at=time.time(),
+        last_updated=time.time(),
+        characters={},
+        setting="",
+        arc_id=None,
+        arc_stage=None,
+        summary="",
+    )
+
+
+def session_from_record(session_id: str, record: Dict) -> StorySession:
+    """
+    Rebuild a StorySession from its entry in the session store.
+    """
+    return StorySession(
+        session_id=session_id,
+        created_at=record["created_at"],
+        last_updated=record.get("last_updated", record["created_at"]),
+        arc_id=record.get("arc_id"),
+        arc_stage=record.get("arc_stage"),
+        characters=record.get("characters", {}),
+        setting=record.get("setting", ""),
+        summary=record.get("summary", ""),
+    )
+
+
 def get_arc_from_session(session: StorySession) -> Optional[Dict]:
     # Fail Safe
     if session.arc_id is None:
@@ -176,30 +205,12 @@ class StorySessionManager:
 
 
     def _set_chosen_session(self, sessions: dict, chosen_id: str) -> StorySession:
-        session = StorySession(
-            session_id=chosen_id,
-            created_at=sessions[chosen_id]["created_at"],
-            last_updated=sessions[chosen_id].get("last_updated", sessions[chosen_id]["created_at"]),
-            arc_id=sessions[chosen_id].get("arc_id"),
-            arc_stage=sessions[chosen_id].get("arc_stage"),
-            characters=sessions[chosen_id].get("characters", {}),
-            setting=sessions[chosen_id].get("setting", ""),
-            summary=sessions[chosen_id].get("summary", ""),
-        )
+        session = session_from_record(chosen_id, sessions[chosen_id])
         self.current_session = session
         return session
 
 
     def _create_new_session(self) -> StorySession:
-        session = StorySession(
-            session_id=str(uuid.uuid4()),
-            created_at=time.time(),
-            last_updated=time.time(),
-            characters={},
-            setting="",
-            arc_id=None,
-            arc_stage=None,
-            summary="",
-        )
+        session = new_story_session()
         self.current_session = session
         return session
@@ -0,0 +1,303 @@
+import fcntl
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from arc_selector import ARC_KEYWORDS, load_arcs, select_predefined_arc
+
+DATA_DIR = "data"
+CACHE_FILE = os.path.join(DATA_DIR, "story_cache.json")
+# Hit counters live apart from the stories so counting a lookup only
+# rewrites a small file.
+STATS_FILE = os.path.join(DATA_DIR, "story_cache_stats.json")
+
+MAX_ENTRIES = 200
+SIMILARITY_THRESHOLD = 0.75
+MAX_AGE_SECONDS = 7 * 24 * 3600
+MAX_SERVES_BEFORE_REFRESH = 20
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with",
+    "about", "story", "stories", "tell", "me", "please", "bedtime", "who",
+    "that", "is", "are", "my", "i", "want", "hear", "some", "can", "you",
+    "once", "upon", "time", "write", "make", "named", "called",
+}
+
+# Capitalized words that commonly open a request without being a name.
+COMMON_OPENERS = STOPWORDS | {word for words in ARC_KEYWORDS.values() for word in words} | {
+    "dog", "cat", "bear", "bunny", "puppy", "kitten", "dragon", "princess",
+    "little", "big", "funny", "silly", "sleepy", "curious", "give", "could",
+}
+
+
+def empty_cache() -> dict:
+    return {"entries": {}}
+
+
+def empty_stats() -> dict:
+    return {"hits": 0, "misses": 0, "entries": {}}
+
+
+def _read_json(path: str, default: dict) -> dict:
+    if not os.path.exists(path):
+        return default
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    """
+    Write to a temp file and rename it over the target, so readers in
+    other processes see either the old file or the new one, never a
+    partial write.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def _cache_file_lock():
+    """
+    Cross-process lock for read-modify-write of the cache files. Plain
+    reads don't need it because writes are atomic renames.
+    """
+    with open(CACHE_FILE + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_cache() -> dict:
+    return _read_json(CACHE_FILE, empty_cache())
+
+
+def load_stats() -> dict:
+    return _read_json(STATS_FILE, empty_stats())
+
+
+def _entry_stats(stats: dict, key: str) -> dict:
+    return stats["entries"].setdefault(
+        key, {"hits": 0, "serves_since_refresh": 0, "last_served_at": None}
+    )
+
+
+def _normalize_word(word: str) -> str:
+    # crude plural folding so "dogs" and "dog" share an entry
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def extract_characters(user_input: str) -> list[str]:
+    """
+    Capitalized words are treated as character names. The first word is
+    capitalized anyway, so it only counts when it isn't a common opener
+    like "Tell" or "Brave".
+    """
+    names = set()
+    for position, word in enumerate(re.findall(r"[A-Za-z]+", user_input)):
+        if not (word[0].isupper() and word[1:].islower()):
+            continue
+        lowered = word.lower()
+        if lowered in STOPWORDS:
+            continue
+        if position == 0 and lowered in COMMON_OPENERS:
+            continue
+        names.add(lowered)
+    return sorted(names)
+
+
+def extract_features(user_input: str, arcs: Dict) -> Dict:
+    """
+    Normalize a request into the features the cache is indexed by:
+    the predefined arc, key words and any named characters.
+    """
+    arc = select_predefined_arc(user_input, arcs)
+    characters = extract_characters(user_input)
+
+    # names are matched separately, so keep them out of the keywords
+    words = re.findall(r"[a-z]+", user_input.lower())
+    keywords = sorted({
+        _normalize_word(w) for w in words
+        if w not in STOPWORDS and w not in characters
+    })
+
+    return {
+        "arc_id": arc["theme"],
+        "keywords": keywords,
+        "characters": characters,
+    }
+
+
+def cache_key(features: Dict) -> str:
+    return (
+        f"{features['arc_id']}:{' '.join(features['keywords'])}"
+        f"|{' '.join(features['characters'])}"
+    )
+
+
+def similarity(features: Dict, entry: Dict) -> float:
+    """
+    Jaccard similarity of keywords, restricted to the same arc and the
+    exact same user-named characters, so one user's named characters
+    are never served to a request that didn't name them.
+    """
+    if features["arc_id"] != entry["arc_id"]:
+        return 0.0
+
+    if set(features["characters"]) != set(entry["characters"]):
+        return 0.0
+
+    a, b = set(features["keywords"]), set(entry["keywords"])
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _record_lookup(key: Optional[str]) -> None:
+    with _cache_file_lock():
+        stats = load_stats()
+        if key is None:
+            stats["misses"] += 1
+        else:
+            entry_stats = _entry_stats(stats, key)
+            entry_stats["hits"] += 1
+            entry_stats["serves_since_refresh"] += 1
+            entry_stats["last_served_at"] = time.time()
+            stats["hits"] += 1
+        _write_json_atomic(STATS_FILE, stats)
+
+
+def find_cached_story(user_input: str, arcs: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Return the best cached entry for the request if it is similar enough
+    to serve instantly, recording a hit or miss either way.
+    """
+    arcs = arcs or load_arcs()
+    features = extract_features(user_input, arcs)
+
+    best_key, best_entry, best_score = None, None, 0.0
+    for key, entry in load_cache()["entries"].items():
+        score = similarity(features, entry)
+        if score > best_score:
+            best_key, best_entry, best_score = key, entry, score
+
+    if best_entry is not None and best_score >= SIMILARITY_THRESHOLD:
+        _record_lookup(best_key)
+        return best_entry
+
+    _record_lookup(None)
+    return None
+
+
+def _evict_lfu(data: dict, stats: dict, keep: Optional[str] = None) -> None:
+    """
+    Drop least frequently used entries down to MAX_ENTRIES. `keep` is
+    the entry just written: it has had no chance to collect hits yet,
+    so it would otherwise always be the first to go.
+    """
+    entries = data["entries"]
+    candidates = [key for key in entries if key != keep]
+
+    def usage(key):
+        # least frequently used first, oldest refresh breaks ties
+        return (stats["entries"].get(key, {}).get("hits", 0), entries[key]["refreshed_at"])
+
+    while len(entries) > MAX_ENTRIES:
+        victim = min(candidates, key=usage)
+        candidates.remove(victim)
+        del entries[victim]
+        stats["entries"].pop(victim, None)
+
+
+def add_to_cache(user_input: str, story: Dict, summary: str, arcs: Optional[Dict] = None) -> str:
+    """
+    Store a judge-approved new story under the request's features.
+    Returns the cache key.
+    """
+    arcs = arcs or load_arcs()
+    features = extract_features(user_input, arcs)
+    key = cache_key(features)
+    now = time.time()
+
+    with _cache_file_lock():
+        data = load_cache()
+        stats = load_stats()
+        existing = data["entries"].get(key)
+        data["entries"][key] = {
+            "prompt": user_input,
+            "arc_id": features["arc_id"],
+            "keywords": features["keywords"],
+            "characters": features["characters"],
+            "story": story,
+            "summary": summary,
+            "created_at": existing["created_at"] if existing else now,
+            "refreshed_at": now,
+        }
+        _entry_stats(stats, key)["serves_since_refresh"] = 0
+        _evict_lfu(data, stats, keep=key)
+        _write_json_atomic(CACHE_FILE, data)
+        _write_json_atomic(STATS_FILE, stats)
+
+    return key
+
+
+def is_stale(entry: Dict, entry_stats: Dict, now: Optional[float] = None) -> bool:
+    now = now or time.time()
+    return (
+        now - entry["refreshed_at"] > MAX_AGE_SECONDS
+        or entry_stats.get("serves_since_refresh", 0) >= MAX_SERVES_BEFORE_REFRESH
+    )
+
+
+def stale_entries() -> list[tuple[str, Dict, Dict]]:
+    """
+    (key, entry, stats) for entries due a refresh, most served first
+    since those are the ones users keep seeing.
+    """
+    stats = load_stats()
+    now = time.time()
+    stale = []
+    for key, entry in load_cache()["entries"].items():
+        entry_stats = stats["entries"].get(key, {})
+        if is_stale(entry, entry_stats, now):
+            stale.append((key, entry, entry_stats))
+    stale.sort(key=lambda item: item[2].get("serves_since_refresh", 0), reverse=True)
+    return stale
+
+
+def cache_report() -> Dict:
+    """
+    Hit rate and freshness of the cache.
+    """
+    data = load_cache()
+    stats = load_stats()
+    hits, misses = stats["hits"], stats["misses"]
+    now = time.time()
+    ages = [now - e["refreshed_at"] for e in data["entries"].values()]
+
+    return {
+        "entries": len(data["entries"]),
+        "max_entries": MAX_ENTRIES,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "stale_entries": len(stale_entries()),
+        "mean_age_seconds": sum(ages) / len(ages) if ages else 0.0,
+        "oldest_age_seconds": max(ages) if ages else 0.0,
+    }
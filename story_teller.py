@@ -1,6 +1,6 @@
 import json
 import os
-from typing import Dict
+from typing import Dict, List, Optional
 from call_model import call_model
 
 PROMPTS_DIR = "prompts"
@@ -39,18 +39,32 @@ def build_storyteller_prompt(context: Dict) -> str:
         )
     elif mode == "continuation":
         return template.format(
-            characters=json.dumps(context["story_state"]["characters"], indent=2),
+            characters=json.dumps(context["story_state"]["characters"]),
             setting=context["story_state"]["setting"],
             summary=context["story_state"]["summary"],
             arc_stage=context["story_state"]["arc_stage"],
             arc_theme=context["arc"]["theme"],
             arc_description=context["arc"]["description"],
             arc_stages=", ".join(context["arc"]["stages"]),
+            remaining_stages=", ".join(
+                remaining_stages(context["arc"], context["story_state"]["arc_stage"])
+            ),
             user_input=context["user_input"],
             feedback_section=feedback_section,
         )
 
 
+def remaining_stages(arc: Dict, current_stage: Optional[str]) -> List[str]:
+    """
+    Stages the story may be in after a continuation: the current one
+    or any later one. Unknown stages allow the full arc.
+    """
+    stages = arc["stages"]
+    if current_stage not in stages:
+        return list(stages)
+    return stages[stages.index(current_stage):]
+
+
 def parse_storyteller_output(output: str) -> Dict:
     """
     Parse and validate storyteller JSON output.
@@ -106,6 +120,100 @@ def parse_storyteller_output(output: str) -> Dict:
 
 
 
+def parse_storyteller_delta_output(output: str) -> Dict:
+    """
+    Parse and validate a continuation delta. Only new or changed
+    characters are expected; setting may be null when unchanged.
+    """
+    try:
+        data = json.loads(output)
+
+        if not isinstance(data, dict):
+            raise ValueError("Top-level JSON must be an object")
+
+        if "story_text" not in data or "delta" not in data:
+            raise ValueError("Missing required top-level fields")
+
+        if not isinstance(data["story_text"], str):
+            raise ValueError("story_text must be a string")
+
+        delta = data["delta"]
+        if not isinstance(delta, dict):
+            raise ValueError("delta must be an object")
+
+        characters = delta.get("characters", {})
+        if not isinstance(characters, dict) or not all(
+            isinstance(v, str) for v in characters.values()
+        ):
+            raise ValueError("characters must be an object of strings")
+
+        if delta.get("setting") is not None and not isinstance(delta["setting"], str):
+            raise ValueError("setting must be a string or null")
+
+        if not isinstance(delta.get("summary"), str):
+            raise ValueError("summary must be a string")
+
+        if not isinstance(delta.get("current_stage"), str):
+            raise ValueError("current_stage must be a string")
+
+        return data
+
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    except Exception as e:
+        raise ValueError(f"Invalid storyteller output: {e}")
+
+
+def merge_story_delta(story_state: Dict, arc: Dict, data: Dict) -> Dict:
+    """
+    Apply a continuation delta to the existing story state and return
+    a full story in the same shape as a new-story response.
+    current_stage may stay put or move forward, never backwards.
+    """
+    delta = data["delta"]
+    # worded for the model: the worker sends it back as retry feedback
+    allowed_stages = remaining_stages(arc, story_state["arc_stage"])
+    stage = delta["current_stage"]
+    if stage not in arc["stages"]:
+        raise ValueError(
+            f"current_stage '{stage}' is not a stage of this arc; "
+            f"use one of: {', '.join(allowed_stages)}"
+        )
+    if stage not in allowed_stages:
+        raise ValueError(
+            f"current_stage '{stage}' moves the story backwards from "
+            f"'{story_state['arc_stage']}'; use one of: {', '.join(allowed_stages)}"
+        )
+
+    characters = dict(story_state["characters"])
+    characters.update(delta.get("characters", {}))
+
+    summary = " ".join(
+        part for part in (story_state["summary"], delta["summary"].strip()) if part
+    )
+
+    return {
+        "story_text": data["story_text"],
+        "metadata": {
+            "characters": characters,
+            "setting": delta.get("setting") or story_state["setting"],
+            "summary": summary,
+            "current_stage": delta["current_stage"],
+        },
+    }
+
+
+def parse_generated_story(output: str, context: Dict) -> Dict:
+    """
+    Parse storyteller output for the context's mode. Continuations
+    are deltas merged into the existing story state.
+    """
+    if context["mode"] == "continuation":
+        data = parse_storyteller_delta_output(output)
+        return merge_story_delta(context["story_state"], context["arc"], data)
+    return parse_storyteller_output(output)
+
+
 def generate_story(context: Dict) -> Dict:
     """
     Generate a story and structured metadata.
@@ -117,7 +225,7 @@ def generate_story(context: Dict) -> Dict:
     """
     prompt = build_storyteller_prompt(context)
     raw_output = call_model(prompt)
-    data = parse_storyteller_output(raw_output)
+    data = parse_generated_story(raw_output, context)
     return data
 
 
@@ -1,9 +1,14 @@
 import json
+import re
 from typing import Dict
 from call_model import call_model
 
 PROMPTS_DIR = "prompts"
 
+# Continuations append one sentence to the running summary; past this
+# length it is re-summarized so prompts don't grow with the story.
+MAX_SUMMARY_SENTENCES = 4
+
 
 def build_summarize_prompt(story_text: str) -> str:
     with open(f"{PROMPTS_DIR}/summarizer.txt", "r", encoding="utf-8") as f:
@@ -44,6 +49,11 @@ def parse_summary_output(output: str) -> str:
         raise ValueError(f"Invalid summarizer output: {e}")
 
 
+def needs_compaction(summary: str) -> bool:
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", summary.strip()) if s]
+    return len(sentences) > MAX_SUMMARY_SENTENCES
+
+
 def summarize_story(story_text: str ) -> str:
     """
     Generate a compact, structured summary for long-term memory.
@@ -0,0 +1,81 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import cpu_pool
+from session import build_character_index, find_candidate_session_ids
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+def make_sessions(n):
+    # descriptions carry the characters the shard splitter looks for
+    return {
+        f"s{i}": {
+            "characters": {f"Pal{i % 7}": 'a "quoted"\n  },\n    "friend', f"Buddy{i}": "a dog"},
+            "summary": "A story.",
+        }
+        for i in range(n)
+    }
+
+
+def write_store(path, sessions, **dump_kwargs):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"sessions": sessions}, f, **dump_kwargs)
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 50, 1000])
+@pytest.mark.parametrize("shards", [1, 2, 7, 64])
+def test_index_from_file_matches_serial(tmp_path, pool, n, shards):
+    sessions = make_sessions(n)
+    path = str(tmp_path / "sessions.json")
+    # same layout as save_sessions
+    write_store(path, sessions, indent=2)
+
+    assert cpu_pool.build_character_index_from_file(path, pool, shards) == build_character_index(sessions)
+
+
+def test_index_from_file_falls_back_for_other_layouts(tmp_path, pool):
+    sessions = make_sessions(20)
+    path = str(tmp_path / "sessions.json")
+    write_store(path, sessions)
+
+    assert cpu_pool._session_shard_ranges(path, 4) is None
+    assert cpu_pool.build_character_index_from_file(path, pool, 4) == build_character_index(sessions)
+
+
+def test_index_from_file_empty_or_missing_store(tmp_path, pool):
+    path = str(tmp_path / "sessions.json")
+    assert cpu_pool.build_character_index_from_file(path, pool) == {}
+
+    write_store(path, {}, indent=2)
+    assert cpu_pool.build_character_index_from_file(path, pool, 4) == {}
+
+
+def test_validate_outputs_keeps_order_and_reports_errors(pool):
+    outputs = [json.dumps({"summary": f"s{i}"}) if i % 3 else "not json" for i in range(10)]
+
+    results = cpu_pool.validate_outputs("summary", outputs, pool, batch_size=3)
+
+    assert [r["ok"] for r in results] == [bool(i % 3) for i in range(10)]
+    assert results[1]["result"] == "s1"
+    assert "Invalid JSON" in results[0]["error"]
+    assert cpu_pool.validate_outputs("summary", outputs, pool, keep_results=False)[1]["result"] is None
+
+
+def test_validate_outputs_rejects_unknown_parser(pool):
+    with pytest.raises(ValueError):
+        cpu_pool.validate_outputs("nope", [], pool)
+
+
+def test_batch_matching_matches_serial(pool):
+    index = build_character_index(make_sessions(40))
+    inputs = ["more about pal3 please", "Buddy12 and Buddy39", "nobody here", "pal1"]
+
+    expected = [find_candidate_session_ids(text, index) for text in inputs]
+    assert cpu_pool.find_candidate_session_ids_batch(inputs, index, pool, shards=3) == expected
@@ -0,0 +1,132 @@
+import time
+
+import pytest
+
+from job_queue import (
+    connect_queue,
+    enqueue_job,
+    claim_job,
+    checkpoint_job,
+    renew_lease,
+    retry_job,
+    get_job,
+    LeaseHeartbeat,
+    LeaseLostError,
+)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect_queue(str(tmp_path / "jobs.db"))
+    yield conn
+    conn.close()
+
+
+def test_claim_takes_oldest_job_exclusively(conn):
+    first = enqueue_job(conn, {"n": 1})
+    enqueue_job(conn, {"n": 2})
+
+    job = claim_job(conn, "w1")
+    assert job["job_id"] == first
+    assert job["lease_owner"] == "w1"
+
+    other = claim_job(conn, "w2")
+    assert other["payload"] == {"n": 2}
+    assert claim_job(conn, "w3") is None
+
+
+def test_enqueue_with_lease_owner_is_not_claimable(conn):
+    job_id = enqueue_job(conn, {}, lease_owner="me")
+
+    assert claim_job(conn, "other") is None
+    job = get_job(conn, job_id)
+    assert job["status"] == "running"
+    assert job["lease_owner"] == "me"
+
+
+def test_expired_lease_is_reclaimed_at_checkpointed_stage(conn):
+    enqueue_job(conn, {"story": None})
+    job = claim_job(conn, "crashed", lease_seconds=-1)
+    job["payload"]["story"] = "once upon a time"
+    checkpoint_job(conn, job, "crashed", "evaluate", lease_seconds=-1)
+
+    resumed = claim_job(conn, "w2")
+    assert resumed["job_id"] == job["job_id"]
+    assert resumed["stage"] == "evaluate"
+    assert resumed["payload"]["story"] == "once upon a time"
+
+
+def test_checkpoint_after_lease_lost_raises(conn):
+    enqueue_job(conn, {})
+    job = claim_job(conn, "slow", lease_seconds=-1)
+    claim_job(conn, "fast")
+
+    with pytest.raises(LeaseLostError):
+        checkpoint_job(conn, job, "slow", "evaluate")
+    assert not renew_lease(conn, job["job_id"], "slow")
+
+
+def test_checkpoint_done_marks_job_done(conn):
+    enqueue_job(conn, {})
+    job = claim_job(conn, "w1")
+    checkpoint_job(conn, job, "w1", "done")
+
+    assert get_job(conn, job["job_id"])["status"] == "done"
+    assert claim_job(conn, "w2") is None
+
+
+def test_retry_backs_off_then_fails_at_cap(conn):
+    enqueue_job(conn, {})
+    job = claim_job(conn, "w1")
+
+    retry_job(conn, job, "w1", "boom", max_attempts=2, backoff_seconds=60)
+    assert claim_job(conn, "w1") is None
+    stored = get_job(conn, job["job_id"])
+    assert stored["attempts"] == 1
+    assert stored["error"] == "boom"
+
+    job = claim_job(conn, "w1", job_id=job["job_id"], lease_seconds=60)
+    assert job is None
+
+    conn.execute("UPDATE jobs SET lease_expires_at = 0")
+    job = claim_job(conn, "w1")
+    retry_job(conn, job, "w1", "boom again", max_attempts=2)
+    assert get_job(conn, job["job_id"])["status"] == "failed"
+    assert claim_job(conn, "w1") is None
+
+
+def test_heartbeat_keeps_lease_alive(conn):
+    enqueue_job(conn, {})
+    job = claim_job(conn, "w1", lease_seconds=0.3)
+
+    with LeaseHeartbeat(conn, job["job_id"], "w1", lease_seconds=0.3) as heartbeat:
+        time.sleep(0.6)
+        assert claim_job(conn, "w2") is None
+
+    assert not heartbeat.lost
+
+
+def test_repeated_lease_expiry_fails_the_job(conn):
+    job_id = enqueue_job(conn, {})
+    claim_job(conn, "w0", lease_seconds=-1)
+
+    # each takeover of an expired lease is a worker that died mid-stage
+    assert claim_job(conn, "w1", lease_seconds=-1, max_attempts=3)["attempts"] == 1
+    assert claim_job(conn, "w2", lease_seconds=-1, max_attempts=3)["attempts"] == 2
+    assert claim_job(conn, "w3", max_attempts=3) is None
+
+    job = get_job(conn, job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 3
+    assert "lease expired" in job["error"]
+
+
+def test_failed_takeover_moves_on_to_next_job(conn):
+    stuck = enqueue_job(conn, {"n": 1})
+    claim_job(conn, "w0", lease_seconds=-1)
+    enqueue_job(conn, {"n": 2})
+
+    job = claim_job(conn, "w1", max_attempts=1)
+
+    assert job["payload"] == {"n": 2}
+    assert get_job(conn, stuck)["status"] == "failed"
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+import story_cache
+from arc_selector import load_arcs
+
+
+STORY = {
+    "story_text": "Once upon a time.",
+    "metadata": {"characters": {"Rex": "a dog"}, "setting": "a park", "summary": "s", "current_stage": "setup"},
+}
+
+
+@pytest.fixture
+def arcs(monkeypatch):
+    # arcs.json is loaded relative to the repo root
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(story_cache.__file__)))
+    return load_arcs()
+
+
+@pytest.fixture(autouse=True)
+def cache_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(story_cache, "CACHE_FILE", str(tmp_path / "story_cache.json"))
+    monkeypatch.setattr(story_cache, "STATS_FILE", str(tmp_path / "story_cache_stats.json"))
+
+
+def test_leading_name_is_a_character(arcs):
+    features = story_cache.extract_features("Luna and the brave dog", arcs)
+    assert features["characters"] == ["luna"]
+    assert "luna" not in features["keywords"]
+
+
+def test_common_opener_is_not_a_character(arcs):
+    assert story_cache.extract_features("Tell me about a brave dog", arcs)["characters"] == []
+    assert story_cache.extract_features("Brave dogs at sea", arcs)["characters"] == []
+
+
+def test_named_characters_are_part_of_the_key(arcs):
+    named = story_cache.extract_features("a story about a brave dog named Timmy", arcs)
+    unnamed = story_cache.extract_features("a story about a brave dog", arcs)
+    assert story_cache.cache_key(named) != story_cache.cache_key(unnamed)
+
+
+def test_named_story_is_not_served_to_other_requests(arcs):
+    story_cache.add_to_cache("a story about a brave dog named Timmy", STORY, "s", arcs)
+
+    assert story_cache.find_cached_story("a story about a brave dog", arcs) is None
+    assert story_cache.find_cached_story("a brave dog story with Max", arcs) is None
+    assert story_cache.find_cached_story("tell me about brave dogs and Timmy", arcs) is not None
+
+
+def test_lookups_are_counted_without_rewriting_stories(arcs):
+    story_cache.add_to_cache("a story about a brave dog", STORY, "s", arcs)
+    with open(story_cache.CACHE_FILE, encoding="utf-8") as f:
+        before = f.read()
+
+    assert story_cache.find_cached_story("a story about brave dogs", arcs) is not None
+    assert story_cache.find_cached_story("a story about a sleepy cat", arcs) is None
+
+    with open(story_cache.CACHE_FILE, encoding="utf-8") as f:
+        assert f.read() == before
+    report = story_cache.cache_report()
+    assert (report["hits"], report["misses"]) == (1, 1)
+
+
+def test_lfu_eviction_keeps_popular_entries(arcs, monkeypatch):
+    monkeypatch.setattr(story_cache, "MAX_ENTRIES", 2)
+    story_cache.add_to_cache("a story about a brave dog", STORY, "s", arcs)
+    story_cache.add_to_cache("a bedtime story about friends", STORY, "s", arcs)
+    story_cache.find_cached_story("a story about a brave dog", arcs)
+
+    story_cache.add_to_cache("a story about a child solving a puzzle", STORY, "s", arcs)
+
+    prompts = {e["prompt"] for e in story_cache.load_cache()["entries"].values()}
+    assert prompts == {"a story about a brave dog", "a story about a child solving a puzzle"}
+    with open(story_cache.STATS_FILE, encoding="utf-8") as f:
+        assert len(json.load(f)["entries"]) == 2
+
+
+def test_new_entry_survives_a_full_cache_of_hit_entries(arcs, monkeypatch):
+    monkeypatch.setattr(story_cache, "MAX_ENTRIES", 2)
+    for prompt in ["a story about a brave dog", "a bedtime story about friends"]:
+        story_cache.add_to_cache(prompt, STORY, "s", arcs)
+        story_cache.find_cached_story(prompt, arcs)
+
+    key = story_cache.add_to_cache("a story about a child solving a puzzle", STORY, "s", arcs)
+
+    entries = story_cache.load_cache()["entries"]
+    assert key in entries
+    assert {e["prompt"] for e in entries.values()} == {
+        "a bedtime story about friends", "a story about a child solving a puzzle",
+    }
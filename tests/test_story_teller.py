@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from story_teller import merge_story_delta, parse_generated_story
+
+
+ARC = {"theme": "adventure", "description": "d", "stages": ["setup", "journey", "resolution"]}
+STATE = {
+    "characters": {"Rex": "a dog", "Owl": "a wise bird"},
+    "setting": "A quiet forest.",
+    "summary": "Rex found a map.",
+    "arc_stage": "journey",
+}
+
+
+def delta(**fields):
+    body = {"characters": {}, "setting": None, "summary": "Rex met Mia.", "current_stage": "journey"}
+    body.update(fields)
+    return {"story_text": "More story.", "delta": body}
+
+
+def test_stage_may_stay_or_move_forward():
+    assert merge_story_delta(STATE, ARC, delta())["metadata"]["current_stage"] == "journey"
+    assert merge_story_delta(STATE, ARC, delta(current_stage="resolution"))["metadata"]["current_stage"] == "resolution"
+
+
+def test_stage_regression_is_rejected():
+    with pytest.raises(ValueError, match="backwards.*journey, resolution"):
+        merge_story_delta(STATE, ARC, delta(current_stage="setup"))
+
+
+def test_unknown_stage_is_rejected():
+    with pytest.raises(ValueError, match="not a stage of this arc"):
+        merge_story_delta(STATE, ARC, delta(current_stage="epilogue"))
+
+
+def test_unknown_current_stage_allows_whole_arc():
+    state = dict(STATE, arc_stage=None)
+    assert merge_story_delta(state, ARC, delta(current_stage="setup"))["metadata"]["current_stage"] == "setup"
+
+
+def test_null_setting_keeps_existing_setting():
+    assert merge_story_delta(STATE, ARC, delta())["metadata"]["setting"] == "A quiet forest."
+    changed = merge_story_delta(STATE, ARC, delta(setting="A sunny beach."))
+    assert changed["metadata"]["setting"] == "A sunny beach."
+
+
+def test_characters_are_updated_and_added():
+    story = merge_story_delta(STATE, ARC, delta(characters={"Rex": "a tired dog", "Mia": "a girl"}))
+    assert story["metadata"]["characters"] == {"Rex": "a tired dog", "Owl": "a wise bird", "Mia": "a girl"}
+    assert STATE["characters"] == {"Rex": "a dog", "Owl": "a wise bird"}
+
+
+def test_summary_delta_is_appended():
+    assert merge_story_delta(STATE, ARC, delta())["metadata"]["summary"] == "Rex found a map. Rex met Mia."
+
+
+def test_continuation_output_is_parsed_as_delta():
+    context = {"mode": "continuation", "arc": ARC, "story_state": STATE}
+    story = parse_generated_story(json.dumps(delta(current_stage="resolution")), context)
+    assert story["story_text"] == "More story."
+    assert story["metadata"]["current_stage"] == "resolution"
@@ -0,0 +1,158 @@
+import pytest
+
+import worker
+from job_queue import connect_queue, claim_job, checkpoint_job, get_job
+
+
+ARC = {"theme": "adventure", "description": "d", "stages": ["setup", "journey", "resolution"]}
+STORY = {
+    "story_text": "Once upon a time.",
+    "metadata": {"characters": {"Rex": "a dog"}, "setting": "a park", "summary": "Rex played.", "current_stage": "setup"},
+}
+ACCEPT = {"accept": True, "feedback": "", "scores": {}, "failure_reason": None}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect_queue(str(tmp_path / "jobs.db"))
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(worker, "persist_session", lambda *args: calls.append("persist"))
+    monkeypatch.setattr(worker, "add_to_cache", lambda *args: calls.append("cache"))
+    monkeypatch.setattr(worker, "summarize_story", lambda text: calls.append("summarize") or "summary")
+    monkeypatch.setattr(worker, "evaluate_story", lambda story, arc: calls.append("evaluate") or ACCEPT)
+    return calls
+
+
+def submit(conn, **kwargs):
+    session = worker.StorySession(
+        session_id="s1", created_at=0.0, last_updated=0.0, arc_id=None, arc_stage=None,
+        characters={}, setting="", summary="",
+    )
+    context = {"mode": "new_story", "arc": ARC, "feedback": "", "story_state": None, "user_input": "a dog"}
+    return worker.submit_story_job(conn, session, ARC, context, **kwargs)
+
+
+def test_resume_skips_completed_stages(conn, calls, monkeypatch):
+    monkeypatch.setattr(worker, "generate_story", lambda context: pytest.fail("already generated"))
+    submit(conn)
+    job = claim_job(conn, "crashed", lease_seconds=-1)
+    job["payload"]["story"] = STORY
+    checkpoint_job(conn, job, "crashed", "evaluate", lease_seconds=-1)
+
+    job = worker.run_job(conn, claim_job(conn, "w2"), "w2")
+
+    assert job["status"] == "done"
+    assert calls == ["evaluate", "summarize", "persist"]
+
+
+def test_only_cache_jobs_fill_the_cache(conn, calls, monkeypatch):
+    monkeypatch.setattr(worker, "generate_story", lambda context: STORY)
+    submit(conn, persist=False, cache=True)
+
+    job = worker.run_job(conn, claim_job(conn, "w1"), "w1")
+
+    assert job["status"] == "done"
+    assert calls == ["evaluate", "summarize", "cache"]
+
+
+def test_invalid_output_is_fed_back_then_fails(conn, calls, monkeypatch):
+    contexts = []
+
+    def bad_generate(context):
+        contexts.append(dict(context))
+        raise ValueError("Invalid storyteller output: bad json")
+
+    monkeypatch.setattr(worker, "generate_story", bad_generate)
+    job_id = submit(conn)
+
+    job = worker.run_job(conn, claim_job(conn, "w1"), "w1")
+
+    assert job["status"] == "failed"
+    assert len(contexts) == worker.MAX_RETRIES + 1
+    assert "bad json" in contexts[-1]["feedback"]
+    assert get_job(conn, job_id)["status"] == "failed"
+    assert claim_job(conn, "w1") is None
+
+
+def test_crash_in_stage_keeps_checkpoint_and_backs_off(conn, calls, monkeypatch):
+    monkeypatch.setattr(worker, "generate_story", lambda context: STORY)
+
+    def flaky_summarize(text):
+        raise RuntimeError("network down")
+
+    monkeypatch.setattr(worker, "summarize_story", flaky_summarize)
+    job_id = submit(conn)
+
+    with pytest.raises(RuntimeError):
+        worker.run_job(conn, claim_job(conn, "w1"), "w1")
+
+    stored = get_job(conn, job_id)
+    assert stored["stage"] == "summarize"
+    assert stored["attempts"] == 1
+    assert claim_job(conn, "w1") is None
+
+
+def submit_continuation(conn, summary):
+    session = worker.StorySession(
+        session_id="s1", created_at=0.0, last_updated=0.0, arc_id="adventure", arc_stage="journey",
+        characters={"Rex": "a dog"}, setting="a park", summary=summary,
+    )
+    context = {
+        "mode": "continuation", "arc": ARC, "feedback": "", "user_input": "more",
+        "story_state": {"characters": session.characters, "setting": session.setting,
+                        "summary": summary, "arc_stage": "journey"},
+    }
+    return worker.submit_story_job(conn, session, ARC, context)
+
+
+def continued_story(summary):
+    return {**STORY, "metadata": {**STORY["metadata"], "summary": summary, "current_stage": "journey"}}
+
+
+def test_short_running_summary_skips_summarizer(conn, calls, monkeypatch):
+    monkeypatch.setattr(worker, "generate_story", lambda context: continued_story("One. Two."))
+    submit_continuation(conn, "One.")
+
+    job = worker.run_job(conn, claim_job(conn, "w1"), "w1")
+
+    assert job["payload"]["summary"] == "One. Two."
+    assert "summarize" not in calls
+
+
+def test_long_running_summary_is_compacted(conn, calls, monkeypatch):
+    monkeypatch.setattr(worker, "generate_story", lambda context: continued_story("A. B. C. D. E."))
+    submit_continuation(conn, "A. B. C. D.")
+
+    job = worker.run_job(conn, claim_job(conn, "w1"), "w1")
+
+    assert job["payload"]["summary"] == "summary"
+    assert "summarize" in calls
+
+
+def test_stage_regression_is_sent_back_as_feedback(conn, calls, monkeypatch):
+    outputs = iter([
+        ValueError("current_stage 'setup' moves the story backwards from 'journey'; use one of: journey, resolution"),
+        continued_story("A. B."),
+    ])
+    feedback = []
+
+    def generate(context):
+        feedback.append(context["feedback"])
+        result = next(outputs)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(worker, "generate_story", generate)
+    submit_continuation(conn, "A.")
+
+    job = worker.run_job(conn, claim_job(conn, "w1"), "w1")
+
+    assert job["status"] == "done"
+    assert "moves the story backwards" in feedback[1]
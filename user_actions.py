@@ -1,18 +1,18 @@
+import time
+
 from session import StorySessionManager, get_arc_from_session, persist_session, clear_sessions
 from arc_selector import select_arc
 from context_builder import build_story_context
-from story_teller import generate_story
-from judge import evaluate_story
-from summarizer import summarize_story
 from guardrails import is_relevant_story_prompt
+from job_queue import connect_queue, claim_job, get_job, list_unfinished_jobs
+from worker import make_worker_id, submit_story_job, run_job
+from story_cache import find_cached_story
 
 
-MAX_RETRIES = 3
-
 def user_actions() -> None:
     response = input(
-        "Do you want to clear previous story sessions, tell a story " \
-        "Respond either clear or story: "
+        "Do you want to clear previous story sessions, tell a story, " \
+        "or resume unfinished stories? Respond either clear, story or resume: "
     ).strip().lower()
 
 
@@ -21,6 +21,9 @@ def user_actions() -> None:
         clear_sessions()
         print("Previous sessions cleared.\n")
         return
+    if response == "resume":
+        resume_unfinished_jobs()
+        return
     if response == "story":
         user_input = input("What kind of story do you want to hear? Or what story did you want to continue (give description of previous story) and what you want next?: ")
         num_retries = 3
@@ -32,32 +35,70 @@ def user_actions() -> None:
     session, is_continuation = session_manager.handle_user_input(user_input)
     if not is_continuation:
         arc = select_arc(user_input)
+        cached = find_cached_story(user_input)
+        if cached is not None:
+            print("Here is your story:")
+            print(cached["story"]["story_text"])
+            persist_session(session, cached["story"], cached["summary"], arc)
+            return
     if is_continuation:
         arc = get_arc_from_session(session)
     context = build_story_context(session, arc, user_input, is_continuation)
 
-    for attempt in range(MAX_RETRIES + 1):
+    conn = connect_queue()
+    worker_id = make_worker_id()
+    # enqueued already leased to us so a background worker can't take it
+    job_id = submit_story_job(conn, session, arc, context, lease_owner=worker_id)
+    run_and_report(conn, get_job(conn, job_id))
 
-        story = generate_story(context)
-        judgment = evaluate_story(story, arc)
 
-        if judgment["accept"]:
-            break
+def run_and_report(conn, job) -> None:
+    try:
+        job = run_job(conn, job, job["lease_owner"])
+    except Exception as e:
+        if job["status"] == "failed":
+            # retry_job gave up on it, so there is nothing to resume
+            print(f"Sorry, we couldn't finish your story ({e}).")
+        else:
+            print(f"Sorry, something went wrong while writing your story ({e}). "
+                  "Its progress is saved; choose resume to try again later.")
+        return
 
-        context["feedback"] = judgment['feedback']
-    
-    if not judgment["accept"]:
-        print(f"Sorry, we couldn't generate a satisfactory story due to {judgment['failure_reason']}")
+    if job["status"] == "failed":
+        judgment = job["payload"]["judgment"]
+        if judgment and not judgment["accept"]:
+            print(f"Sorry, we couldn't generate a satisfactory story due to {judgment['failure_reason']}")
+        else:
+            print(f"Sorry, we couldn't generate a satisfactory story ({job['error']})")
         return
-    
-    else:
-        print("Here is your story:")
-        print(story["story_text"])
-        summary = summarize_story(story['story_text'])
-        persist_session(session, story, summary, arc)
 
-        
-        
+    print("Here is your story:")
+    print(job["payload"]["story"]["story_text"])
+
 
+def resume_unfinished_jobs() -> None:
+    """
+    Finish stories left in flight by a crashed run, starting from
+    the last completed stage.
+    """
+    conn = connect_queue()
+    worker_id = make_worker_id()
+    unfinished = list_unfinished_jobs(conn)
+    if not unfinished:
+        print("No unfinished stories to resume.\n")
+        return
 
-    
\ No newline at end of file
+    for pending in unfinished:
+        job = claim_job(conn, worker_id, job_id=pending["job_id"])
+        if job is None:
+            current = get_job(conn, pending["job_id"])
+            if current["status"] == "failed":
+                print(f"A story could not be finished ({current['error']}).")
+            elif current["lease_owner"] is None:
+                wait = max(0, round(current["lease_expires_at"] - time.time()))
+                print(f"A story is waiting to retry; try resume again in about {wait} seconds.")
+            else:
+                print("A story is still being written by another worker.")
+            continue
+        print(f"Resuming story from stage '{job['stage']}'")
+        run_and_report(conn, job)
@@ -0,0 +1,198 @@
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from session import StorySession, persist_session
+from story_teller import generate_story
+from judge import evaluate_story
+from summarizer import summarize_story, needs_compaction
+from story_cache import add_to_cache
+from job_queue import (
+    connect_queue,
+    enqueue_job,
+    claim_job,
+    checkpoint_job,
+    fail_job,
+    retry_job,
+    LeaseHeartbeat,
+    LeaseLostError,
+)
+
+
+MAX_RETRIES = 3
+POLL_INTERVAL = 1.0
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def build_job_payload(
+    session: StorySession,
+    arc: Dict,
+    context: Dict,
+    persist: bool = True,
+    cache: bool = False,
+) -> Dict:
+    """
+    Everything a worker needs to run the pipeline without the user present.
+    Stage outputs are filled in as checkpoints are written.
+    `persist` saves the result as a session; `cache` adds approved new
+    stories to the shared story cache, which only the cache refresher
+    should fill so one user's story is never served to another.
+    """
+    return {
+        "session": asdict(session),
+        "arc": arc,
+        "context": context,
+        "persist": persist,
+        "cache": cache,
+        "attempt": 0,
+        "story": None,
+        "judgment": None,
+        "summary": None,
+    }
+
+
+def submit_story_job(
+    conn: sqlite3.Connection,
+    session: StorySession,
+    arc: Dict,
+    context: Dict,
+    lease_owner: Optional[str] = None,
+    persist: bool = True,
+    cache: bool = False,
+) -> str:
+    """
+    Enqueue a story job. Pass `lease_owner` to keep the job for the
+    caller instead of letting any worker pick it up.
+    """
+    payload = build_job_payload(session, arc, context, persist=persist, cache=cache)
+    return enqueue_job(conn, payload, lease_owner=lease_owner)
+
+
+def run_job(conn: sqlite3.Connection, job: Dict, worker_id: str) -> Dict:
+    """
+    Run a claimed job from its current stage to completion,
+    checkpointing after every stage so a crash only repeats the
+    stage that was in flight.
+    """
+    try:
+        with LeaseHeartbeat(conn, job["job_id"], worker_id):
+            _run_stages(conn, job, worker_id)
+
+    except LeaseLostError:
+        # another worker owns the job now; drop it without touching state
+        raise
+    except Exception as e:
+        # keep completed checkpoints and retry later, up to a cap
+        retry_job(conn, job, worker_id, f"{type(e).__name__}: {e}")
+        raise
+
+    return job
+
+
+def _retry_generation(conn: sqlite3.Connection, job: Dict, worker_id: str, feedback: str, error: str) -> bool:
+    """
+    Send the story back to the storyteller with feedback, or fail the
+    job once MAX_RETRIES regenerations have been used.
+    Returns False if the job was failed.
+    """
+    payload = job["payload"]
+    if payload["attempt"] >= MAX_RETRIES:
+        fail_job(conn, job, worker_id, error)
+        return False
+
+    payload["attempt"] += 1
+    payload["context"]["feedback"] = feedback
+    checkpoint_job(conn, job, worker_id, "generate")
+    return True
+
+
+def _run_stages(conn: sqlite3.Connection, job: Dict, worker_id: str) -> None:
+    payload = job["payload"]
+
+    while job["stage"] != "done":
+        stage = job["stage"]
+
+        if stage == "generate":
+            try:
+                payload["story"] = generate_story(payload["context"])
+            except ValueError as e:
+                # malformed output is the model's mistake, so it gets the
+                # same feedback loop as a judge rejection
+                feedback = f"Your previous response was invalid ({e}). Follow the output format exactly."
+                if not _retry_generation(conn, job, worker_id, feedback, f"invalid output: {e}"):
+                    return
+                continue
+            checkpoint_job(conn, job, worker_id, "evaluate")
+
+        elif stage == "evaluate":
+            judgment = evaluate_story(payload["story"], payload["arc"])
+            payload["judgment"] = judgment
+            if judgment["accept"]:
+                checkpoint_job(conn, job, worker_id, "summarize")
+            elif not _retry_generation(
+                conn, job, worker_id, judgment["feedback"], f"rejected: {judgment['failure_reason']}"
+            ):
+                return
+
+        elif stage == "summarize":
+            if payload["context"]["mode"] == "continuation":
+                # the merged delta already carries the running summary;
+                # only pay for a summarizer call once it gets long
+                summary = payload["story"]["metadata"]["summary"]
+                if needs_compaction(summary):
+                    summary = summarize_story(summary)
+                payload["summary"] = summary
+            else:
+                payload["summary"] = summarize_story(payload["story"]["story_text"])
+            checkpoint_job(conn, job, worker_id, "persist")
+
+        elif stage == "persist":
+            if payload.get("persist", True):
+                persist_session(
+                    StorySession(**payload["session"]),
+                    payload["story"],
+                    payload["summary"],
+                    payload["arc"],
+                )
+            if payload.get("cache", False) and payload["context"]["mode"] == "new_story":
+                add_to_cache(payload["context"]["user_input"], payload["story"], payload["summary"])
+            checkpoint_job(conn, job, worker_id, "done")
+
+        else:
+            raise ValueError(f"Unknown stage: {stage}")
+
+
+def run_worker(max_jobs: Optional[int] = None, poll_interval: float = POLL_INTERVAL) -> None:
+    """
+    Claim and run jobs until `max_jobs` have been processed.
+    Several workers can run against the same queue file.
+    """
+    conn = connect_queue()
+    worker_id = make_worker_id()
+    processed = 0
+
+    while max_jobs is None or processed < max_jobs:
+        job = claim_job(conn, worker_id)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            job = run_job(conn, job, worker_id)
+            print(f"[{worker_id}] job {job['job_id']} {job['status']}")
+        except LeaseLostError as e:
+            print(f"[{worker_id}] {e}")
+        except Exception as e:
+            print(f"[{worker_id}] job {job['job_id']} interrupted: {e}")
+        processed += 1
+
+
+if __name__ == "__main__":
+    run_worker()